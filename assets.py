@@ -0,0 +1,23 @@
+import hashlib
+from pathlib import Path
+
+STATIC_DIR = Path(__file__).parent / "static"
+
+# Streamlit serves ./static at this URL prefix when server.enableStaticServing is on
+STATIC_URL = "app/static"
+
+_static_urls = {}  # path -> fingerprinted URL, only for files that exist
+
+
+def static_url(path):
+    # Fingerprint the URL with the file contents so browsers can cache it indefinitely
+    # (see server.py) and still pick up a rebuilt asset immediately. Misses are not
+    # remembered, so an asset built after startup is picked up on the next rerun.
+    url = _static_urls.get(path)
+    if url is None:
+        file_path = STATIC_DIR / path
+        if not file_path.is_file():
+            return None
+        digest = hashlib.sha1(file_path.read_bytes()).hexdigest()[:10]
+        url = _static_urls[path] = f"{STATIC_URL}/{path}?v={digest}"
+    return url
@@ -0,0 +1,342 @@
+"""Drive concurrent simulated sessions against a local app process and report rerun latency.
+
+Starts `streamlit run server.py` on a free local port, then for each concurrency level
+opens that many websocket sessions speaking Streamlit's own protocol (the same
+BackMsg/ForwardMsg protobufs the browser sends), each walking through a realistic flow:
+load the page, add countries and enter trips, toggle the Global/Regional benchmark and
+filter to one country. Reports p50/p95/p99 rerun latency, throughput and the server
+process's memory per level, and writes the numbers to benchmarks/results/. Nothing
+leaves the machine.
+
+    python -m benchmarks.loadtest
+    python -m benchmarks.loadtest --sessions 1,10,50 --duration 60 --think 0
+    python -m benchmarks.loadtest --metrics   # also save the app's /metrics at the end
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+from benchmarks.run import REPO_ROOT, RESULTS_DIR, git_revision
+
+DEFAULT_SESSIONS = "1,5,10,25"
+FILTER_LABEL = "Filter to one country (optional)"
+ADD_COUNTRY_LABEL = "➕ Add Another Country"
+
+# A rerun triggered by st.rerun() reports this before the run that replaces it
+FINISHED_EARLY_FOR_RERUN = 2
+
+
+# -------------------------
+# Server Process
+# -------------------------
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, metrics_port, log_path):
+    env = dict(os.environ)
+    if metrics_port:
+        env.update(APP_METRICS="1", APP_METRICS_PORT=str(metrics_port))
+    log = open(log_path, "w")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", "server.py",
+         "--server.port", str(port), "--server.address", "127.0.0.1", "--server.headless", "true",
+         "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false"],
+        cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    return process, log
+
+
+def wait_until_healthy(port, process, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode} before it became healthy")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=2) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"Server not healthy after {timeout}s")
+
+
+def memory_mb(pid):
+    # Resident and peak resident set size from /proc, in MiB (Linux only)
+    values = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("VmRSS", "VmHWM"):
+                values[key] = int(rest.split()[0]) / 1024
+    return values.get("VmRSS", 0.0), values.get("VmHWM", 0.0)
+
+
+# -------------------------
+# Simulated Session
+# -------------------------
+class Session:
+    # One browser tab. Like the frontend, it resends the value of every widget it has
+    # set on each rerun, addressed by the widget IDs the last run rendered.
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.widgets = {}  # widget key (or label, for unkeyed widgets) -> element proto
+        self.values = {}   # widget key or label -> value last set
+
+    def widget_states(self):
+        states = []
+        for name, value in self.values.items():
+            if name not in self.widgets:
+                continue
+            state = WidgetState(id=self.widgets[name].id)
+            if isinstance(value, str):
+                state.string_value = value
+            else:
+                state.int_value = value
+            states.append(state)
+        return states
+
+    async def rerun(self, trigger=None):
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.widget_states.widgets.extend(self.widget_states())
+        if trigger is not None:
+            msg.rerun_script.widget_states.widgets.append(WidgetState(id=self.widgets[trigger].id, trigger_value=True))
+
+        started = time.perf_counter()
+        await self.ws.send(msg.SerializeToString())
+        widgets = {}
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(await self.ws.recv())
+            kind = forward.WhichOneof("type")
+            if kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                element = getattr(forward.delta.new_element, forward.delta.new_element.WhichOneof("type"))
+                widget_id = getattr(element, "id", "")
+                if widget_id.startswith("$$ID-") and "label" in element.DESCRIPTOR.fields_by_name:
+                    key = widget_id.rsplit("-", 1)[1]
+                    widgets[element.label if key == "None" else key] = element
+            elif kind == "script_finished":
+                if forward.script_finished == FINISHED_EARLY_FOR_RERUN:
+                    widgets = {}
+                    continue
+                self.widgets = widgets
+                return time.perf_counter() - started
+
+    async def set(self, name, value):
+        self.values[name] = value
+        return await self.rerun()
+
+    async def click(self, name):
+        return await self.rerun(trigger=name)
+
+
+async def user_flow(session, rng, countries, think, record):
+    # Load the page, enter a portfolio row by row, compare benchmarks, then filter
+    async def step(action, rerun):
+        if think:
+            await asyncio.sleep(rng.uniform(0, 2 * think))
+        record(action, await rerun)
+
+    await step("load", session.rerun())
+    options = [o for o in session.widgets["country1"].options if o]
+    for row in range(1, countries + 1):
+        if f"country{row}" not in session.widgets:
+            await step("add_country_row", session.click(ADD_COUNTRY_LABEL))
+        await step("select_country", session.set(f"country{row}", rng.choice(options)))
+        await step("enter_trips", session.set(f"trav{row}", rng.randint(1, 5000)))
+
+    await step("toggle_regional", session.click("regional_btn_click"))
+    await step("toggle_global", session.click("global_btn_click"))
+    chosen = [o for o in session.widgets[FILTER_LABEL].options if o != "All"]
+    await step("filter_country", session.set(FILTER_LABEL, rng.choice(chosen)))
+    await step("filter_all", session.set(FILTER_LABEL, "All"))
+
+
+# -------------------------
+# Load Levels
+# -------------------------
+class LevelFinished(Exception):
+    pass
+
+
+async def run_session(url, deadline, rng, args, samples, errors):
+    # Keeps starting fresh sessions (new tabs) until the level's time is up. Reruns that
+    # finish after the deadline are dropped, so every level measures the same window.
+    def record(action, seconds):
+        if time.monotonic() > deadline:
+            raise LevelFinished
+        samples.append((action, seconds))
+
+    await asyncio.sleep(rng.uniform(0, 1))
+    while time.monotonic() < deadline:
+        try:
+            async with websockets.connect(url, subprotocols=["streamlit"], max_size=None,
+                                          open_timeout=args.timeout) as ws:
+                await asyncio.wait_for(user_flow(Session(ws), rng, args.countries, args.think, record),
+                                       timeout=max(deadline - time.monotonic(), 0) + args.timeout)
+        except LevelFinished:
+            break
+        except TimeoutError:
+            errors.append("rerun timed out")
+        except (OSError, websockets.WebSocketException, KeyError) as exc:
+            errors.append(f"{type(exc).__name__}: {exc}")
+
+
+async def sample_memory(pid, peaks, stop):
+    while not stop.is_set():
+        rss, _ = memory_mb(pid)
+        peaks.append(rss)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=0.5)
+        except TimeoutError:
+            pass
+
+
+def latency_summary(seconds):
+    ms = np.array(seconds) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"count": len(ms), "p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "max_ms": ms.max()}
+
+
+async def run_level(url, pid, n_sessions, args):
+    samples, errors, rss = [], [], []
+    stop = asyncio.Event()
+    start_rss, _ = memory_mb(pid)
+    sampler = asyncio.create_task(sample_memory(pid, rss, stop))
+
+    started = time.monotonic()
+    deadline = started + args.duration
+    await asyncio.gather(*(run_session(url, deadline, random.Random(f"{args.seed}-{n_sessions}-{i}"),
+                                       args, samples, errors)
+                           for i in range(n_sessions)))
+    elapsed = time.monotonic() - started
+    stop.set()
+    await sampler
+    end_rss, peak_rss = memory_mb(pid)
+
+    level = {
+        "sessions": n_sessions,
+        "duration_s": elapsed,
+        "reruns": len(samples),
+        "errors": len(errors),
+        "error_examples": sorted(set(errors))[:5],
+        "throughput_rps": len(samples) / elapsed,
+        "memory_mb": {"start_rss": start_rss, "peak_rss": max(rss, default=end_rss),
+                      "end_rss": end_rss, "process_peak_rss": peak_rss},
+    }
+    if samples:
+        level["latency"] = latency_summary([s for _, s in samples])
+        level["by_action"] = {action: latency_summary([s for a, s in samples if a == action])
+                              for action in dict.fromkeys(a for a, _ in samples)}
+    return level
+
+
+def print_level(level):
+    memory = level["memory_mb"]
+    print(f"\n{level['sessions']} concurrent sessions: {level['reruns']} reruns in {level['duration_s']:.1f}s "
+          f"({level['throughput_rps']:.2f}/s), {level['errors']} errors, "
+          f"RSS {memory['start_rss']:.0f} -> peak {memory['peak_rss']:.0f} MiB")
+    if "latency" not in level:
+        return
+    print(f"  {'action':<20} {'count':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    for action, stats in [("all reruns", level["latency"]), *level["by_action"].items()]:
+        print(f"  {action:<20} {stats['count']:>6} {stats['p50_ms']:>10.1f} {stats['p95_ms']:>10.1f} "
+              f"{stats['p99_ms']:>10.1f} {stats['max_ms']:>10.1f}")
+
+
+# -------------------------
+# Results File
+# -------------------------
+def write_results(levels, args, idle_rss, metrics_text, output):
+    import streamlit
+
+    commit, dirty = git_revision()
+    timestamp = datetime.now(timezone.utc)
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": timestamp.isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "versions": {"streamlit": streamlit.__version__, "websockets": websockets.__version__},
+        "options": {"sessions": args.sessions, "duration": args.duration, "think": args.think,
+                    "countries": args.countries, "seed": args.seed},
+        "idle_rss_mb": idle_rss,
+        "levels": levels,
+    }
+    if metrics_text is not None:
+        report["metrics"] = metrics_text
+    if output is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        output = RESULTS_DIR / f"loadtest-{timestamp:%Y%m%d-%H%M%S}-{commit}{'-dirty' if dirty else ''}.json"
+    Path(output).write_text(json.dumps(report, indent=2))
+    print(f"\nWrote {output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", default=DEFAULT_SESSIONS, help="comma-separated concurrency levels, run in order")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to hold each level")
+    parser.add_argument("--think", type=float, default=0.5,
+                        help="mean pause between a session's actions in seconds (0 for back-to-back reruns)")
+    parser.add_argument("--countries", type=int, default=5, help="countries each session enters")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds before a single rerun counts as failed")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--metrics", action="store_true", help="run the app with APP_METRICS=1 and save its /metrics")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/loadtest-<time>-<commit>.json)")
+    args = parser.parse_args()
+
+    port = free_port()
+    metrics_port = free_port() if args.metrics else None
+    log_path = Path(tempfile.gettempdir()) / f"loadtest-server-{port}.log"
+    process, log = start_server(port, metrics_port, log_path)
+    try:
+        wait_until_healthy(port, process)
+        idle_rss, _ = memory_mb(process.pid)
+        print(f"Server pid {process.pid} on port {port} (log: {log_path}), idle RSS {idle_rss:.0f} MiB")
+
+        url = f"ws://127.0.0.1:{port}/_stcore/stream"
+        levels = []
+        for n_sessions in (int(n) for n in args.sessions.split(",") if n):
+            levels.append(asyncio.run(run_level(url, process.pid, n_sessions, args)))
+            print_level(levels[-1])
+
+        metrics_text = None
+        if metrics_port:
+            with urllib.request.urlopen(f"http://127.0.0.1:{metrics_port}/metrics", timeout=10) as response:
+                metrics_text = response.read().decode()
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log.close()
+
+    write_results(levels, args, idle_rss, metrics_text, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""Time data loading, each simulation stage, the figure builds and full page reruns.
+
+Runs against the bundled workbooks and a synthetic dataset (random rates and costs for
+every country the map can draw), with synthetic portfolios of increasing size, and
+writes the timings to benchmarks/results/ so runs on different commits can be compared:
+
+    python -m benchmarks.run
+    python -m benchmarks.run --sizes 1000 --repeat 3 --skip-page
+    python -m benchmarks.run --sizes 1000,10000,100000 --repeat 2   # add the slow 100k portfolios
+    python -m benchmarks.run --compare benchmarks/results/OLD.json benchmarks/results/NEW.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+# Streamlit resets its log levels on every run, so mute the bare-mode and per-rerun
+# deprecation warnings by disabling their loggers instead
+for _logger in ("streamlit.deprecation_util", "streamlit.runtime.scriptrunner_utils.script_run_context"):
+    logging.getLogger(_logger).disabled = True
+
+import geo  # noqa: E402
+import simulation  # noqa: E402
+from charts import (case_breakdown_figure, country_bar_figure, country_map_figure,  # noqa: E402
+                    higher_risk_figure, map_metric_formats)
+from simulation import CASE_TYPES, COST_SUFFIX, PROBABILITY_SUFFIX  # noqa: E402
+
+APP_PATH = REPO_ROOT / "app.py"
+RESULTS_DIR = REPO_ROOT / "benchmarks" / "results"
+
+DEFAULT_SIZES = "1000,10000"
+
+
+# -------------------------
+# Synthetic Data
+# -------------------------
+def write_synthetic_workbooks(directory, seed=0):
+    # Same sheets and columns as the bundled workbooks, so simulation.load_data() and the
+    # page can read them unchanged when run from this directory. The countries are every
+    # name the map has geometry for (region_mapping's among them), so the map and the
+    # regional benchmark are timed with real shapes and regions, only the numbers are made up.
+    rng = np.random.default_rng(seed)
+    countries = sorted(json.loads(geo.GEOMETRY_PATH.read_text(encoding="utf-8"))["iso_by_name"])
+    n_countries = len(countries)
+
+    trips_df = pd.DataFrame({"Country Name": countries, "International Trips": rng.integers(100, 500_000, n_countries)})
+    for case_type in CASE_TYPES:
+        trips_df[f"{case_type.name}{PROBABILITY_SUFFIX}"] = rng.exponential(0.002, n_countries)
+
+    cost_df = pd.DataFrame({"CountryName": countries})
+    for cost_col in (f"{case_type.name}{COST_SUFFIX}" for case_type in CASE_TYPES if case_type.cost_as is None):
+        costs = rng.lognormal(7, 1.5, n_countries)
+        costs[rng.random(n_countries) < 0.2] = np.nan
+        cost_df[cost_col] = costs
+
+    directory = Path(directory)
+    trips_df.to_excel(directory / simulation.TRIPS_WORKBOOK, sheet_name="Trips and Cases", index=False)
+    cost_df.to_excel(directory / simulation.COST_WORKBOOK, sheet_name="Sheet1", index=False)
+    return countries
+
+
+def synthetic_portfolio(countries, n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return list(rng.choice(countries, n_rows)), [int(t) for t in rng.integers(1, 5_000, n_rows)]
+
+
+# -------------------------
+# Timing
+# -------------------------
+def time_call(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "repeat": repeat,
+        "min_ms": min(timings),
+        "median_ms": statistics.median(timings),
+        "mean_ms": statistics.fmean(timings),
+    }
+
+
+def record(results, name, stats):
+    results[name] = stats
+    print(f"  {name:<60} median {stats['median_ms']:>10.2f} ms   min {stats['min_ms']:>10.2f} ms")
+
+
+def bench_stages(results, label, trips_path, cost_path, sizes, repeat):
+    print(f"\n[{label}] loading and simulation stages")
+    record(results, f"{label}/load_data", time_call(lambda: simulation.load_data(trips_path, cost_path), repeat))
+
+    # Derived with the page's own region_mapping, so the stages see the same tables a rerun does
+    data, case_costs = simulation.load_data(trips_path, cost_path)
+    record(results, f"{label}/reference_tables",
+           time_call(lambda: simulation.reference_tables(data, case_costs), repeat))
+
+    reference = simulation.reference_tables(data, case_costs)
+    country_rates = reference["country_rates"]
+    global_rates, regional_rates = reference["global_rates"], reference["regional_rates"]
+    all_countries = list(country_rates.index)
+    region = next(iter(regional_rates))
+
+    for n_rows in sizes:
+        prefix = f"{label}/{n_rows}_rows"
+        countries, trip_counts = synthetic_portfolio(all_countries, n_rows)
+        results_df = simulation.estimate_cases(country_rates, countries, trip_counts)
+        total_trips = results_df["Trips"].sum()
+        all_higher_risks = simulation.higher_risks(global_rates, results_df, total_trips)
+        map_df = simulation.country_map_metrics(global_rates, case_costs, results_df)
+
+        stages = {
+            "estimate_cases": lambda: simulation.estimate_cases(country_rates, countries, trip_counts),
+            "global_benchmark": lambda: simulation.global_benchmark(global_rates, total_trips),
+            "regional_benchmark": lambda: simulation.regional_benchmark(regional_rates, total_trips, region),
+            "user_case_totals": lambda: simulation.user_case_totals(results_df),
+            "higher_risks": lambda: simulation.higher_risks(global_rates, results_df, total_trips),
+            "cost_risk_areas": lambda: simulation.cost_risk_areas(case_costs, countries, all_higher_risks),
+            "country_map_metrics": lambda: simulation.country_map_metrics(global_rates, case_costs, results_df),
+            # Figures are timed through JSON serialization, which is what a rerun pays for
+            "figure/country_bar": lambda: country_bar_figure(results_df).to_json(),
+            "figure/case_breakdown": lambda: case_breakdown_figure(
+                simulation.user_case_totals(results_df), "Estimated Cases", "Your Estimated Case Breakdown").to_json(),
+            "figure/country_map": lambda: country_map_figure(map_df, next(iter(map_metric_formats))).to_json(),
+        }
+        top_risks = simulation.top_higher_risks(all_higher_risks)
+        if top_risks:
+            stages["figure/higher_risk"] = lambda: higher_risk_figure(top_risks).to_json()
+
+        for name, fn in stages.items():
+            record(results, f"{prefix}/{name}", time_call(fn, repeat))
+
+
+# -------------------------
+# Page Reruns
+# -------------------------
+def bench_page(results, label, workdir, countries, trip_counts, repeat):
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    print(f"\n[{label}] page reruns with {len(countries)} countries entered")
+    prefix = f"{label}/page_{len(countries)}_rows"
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)  # the page reads the workbooks relative to the working directory
+    try:
+        def run(at):
+            # A rerun that raised is usually quick, so time it and it reads as a speed-up
+            at = at.run()
+            if at.exception:
+                raise RuntimeError(f"Page raised during benchmark: {at.exception[0].message}")
+            return at
+
+        def new_session():
+            at = AppTest.from_file(str(APP_PATH), default_timeout=600)
+            at.session_state["num_rows"] = len(countries)
+            for i, (country, trips) in enumerate(zip(countries, trip_counts), 1):
+                at.session_state[f"country{i}"] = country
+                at.session_state[f"trav{i}"] = trips
+            return at
+
+        def cold_run():
+            st.cache_resource.clear()
+            run(new_session())
+
+        record(results, f"{prefix}/first_run_cold_cache", time_call(cold_run, repeat))
+        record(results, f"{prefix}/first_run_warm_cache", time_call(lambda: run(new_session()), repeat))
+
+        at = run(new_session())
+        record(results, f"{prefix}/rerun", time_call(lambda: run(at), repeat))
+
+        def toggle_benchmark():
+            run(at.button(key="regional_btn_click").click())
+            if not any(select.key == "region_select" for select in at.selectbox):
+                raise RuntimeError("Regional benchmark not shown; no entered country's data has a region")
+            run(at.button(key="global_btn_click").click())
+        record(results, f"{prefix}/toggle_global_regional", time_call(toggle_benchmark, repeat))
+
+        filter_select = next(s for s in at.selectbox if s.label == "Filter to one country (optional)")
+        record(results, f"{prefix}/filter_country", time_call(
+            lambda: run(filter_select.set_value(countries[0])), repeat))
+
+        def map_view():
+            run(at.radio(key="country_chart_view").set_value("Map"))
+            run(at.radio(key="country_chart_view").set_value("Bar Chart"))
+        record(results, f"{prefix}/switch_to_map_and_back", time_call(map_view, repeat))
+    finally:
+        os.chdir(previous_cwd)
+        st.cache_resource.clear()
+
+
+# -------------------------
+# Results Files
+# -------------------------
+def git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+def write_results(results, args, output):
+    import plotly
+    import streamlit
+
+    commit, dirty = git_revision()
+    timestamp = datetime.now(timezone.utc)
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": timestamp.isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "versions": {"pandas": pd.__version__, "numpy": np.__version__,
+                     "plotly": plotly.__version__, "streamlit": streamlit.__version__},
+        "options": {"sizes": args.sizes, "repeat": args.repeat, "page_rows": args.page_rows},
+        "results": results,
+    }
+    if output is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        output = RESULTS_DIR / f"{timestamp:%Y%m%d-%H%M%S}-{commit}{'-dirty' if dirty else ''}.json"
+    Path(output).write_text(json.dumps(report, indent=2))
+    print(f"\nWrote {output}")
+
+
+def compare(old_path, new_path, threshold):
+    old, new = json.loads(Path(old_path).read_text()), json.loads(Path(new_path).read_text())
+    print(f"{'stage':<60} {old['commit']:>12} {new['commit']:>12}   change")
+    regressions = 0
+    for name in sorted(set(old["results"]) | set(new["results"])):
+        if name not in old["results"] or name not in new["results"]:
+            print(f"{name:<60} {'only in ' + (old_path if name in old['results'] else new_path)}")
+            continue
+        before, after = old["results"][name]["median_ms"], new["results"][name]["median_ms"]
+        ratio = after / before if before else float("inf")
+        flag = "  <-- slower" if ratio > 1 + threshold else ""
+        regressions += bool(flag)
+        print(f"{name:<60} {before:>10.2f}ms {after:>10.2f}ms   {ratio:>6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated portfolio sizes for the stage benchmarks (100000 takes a while)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed repetitions per stage")
+    parser.add_argument("--page-rows", type=int, default=25, help="countries entered for the synthetic page reruns")
+    parser.add_argument("--skip-page", action="store_true", help="skip the full page reruns")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two results files and exit")
+    parser.add_argument("--threshold", type=float, default=0.1, help="slowdown reported as a regression by --compare")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    results = {}
+    synthetic_dir = tempfile.mkdtemp(prefix="travel-risk-bench-")
+    try:
+        synthetic_countries = write_synthetic_workbooks(synthetic_dir)
+        synthetic_label = f"synthetic_{len(synthetic_countries)}"
+
+        bench_stages(results, "bundled", REPO_ROOT / simulation.TRIPS_WORKBOOK, REPO_ROOT / simulation.COST_WORKBOOK,
+                     sizes, args.repeat)
+        bench_stages(results, synthetic_label, Path(synthetic_dir) / simulation.TRIPS_WORKBOOK,
+                     Path(synthetic_dir) / simulation.COST_WORKBOOK, sizes, args.repeat)
+
+        if not args.skip_page:
+            bench_page(results, "bundled", REPO_ROOT, ["France", "Kenya", "Japan"], [100, 1000, 250], args.repeat)
+            bench_page(results, synthetic_label, synthetic_dir,
+                       *synthetic_portfolio(synthetic_countries, args.page_rows), args.repeat)
+    finally:
+        shutil.rmtree(synthetic_dir, ignore_errors=True)
+
+    write_results(results, args, args.output)
+
+
+if __name__ == "__main__":
+    main()
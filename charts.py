@@ -0,0 +1,195 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+import metrics
+from geo import country_isos, country_shapes, other_country_shapes
+from simulation import case_type_colors, case_type_descriptions
+
+# Figure builders for each chart in the report, kept apart from the page layout.
+
+# -------------------------
+# Map Metrics and their Hover Formats
+# -------------------------
+map_metric_formats = {
+    "Estimated Cases": ".2f",
+    "Expected Cost": "$,.0f",
+    "Cases per Trip vs. Global Mean": ".1f",
+}
+
+
+@metrics.timed("charts.country_bar")
+def country_bar_figure(results_df):
+    fig = px.bar(results_df, x="Country", y="Total Cases",
+                 text=results_df["Total Cases"].round(2),
+                 title="Estimated Cases by Country",
+                 color_discrete_sequence=["#2f4696", "#232762", "#4a69bd"])
+    fig.update_layout(showlegend=False, plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
+    return fig
+
+
+@metrics.timed("charts.country_map")
+def country_map_figure(map_df, map_metric):
+    map_df = map_df.assign(ISO=country_isos(map_df["Country"])).dropna(subset=["ISO"]).set_index("ISO")
+    value_format = map_metric_formats[map_metric]
+    # Expected cost leaves out case types the country has no average cost for, so say so
+    if map_metric == "Expected Cost":
+        map_df["Note"] = map_df["Missing Cost Data"].map(
+            lambda missing: f"<br>Partial cost coverage, no cost data for: {missing}" if missing else "")
+    else:
+        map_df["Note"] = ""
+    # Countries without a value (no cost data at all) are drawn grey and say so on hover
+    no_data = map_df[map_df[map_metric].isna()]
+    map_df = map_df.drop(no_data.index)
+    shapes, points = country_shapes(map_df.index)
+    no_data_shapes, no_data_points = country_shapes(no_data.index)
+    context_shapes = other_country_shapes([*map_df.index, *no_data.index])
+    shaped_df = map_df.loc[[f["id"] for f in shapes["features"]]].reset_index()
+    point_df = map_df.loc[[p[0] for p in points]].reset_index()
+
+    fig = go.Figure()
+    fig.add_trace(go.Choroplethmap(
+        geojson=context_shapes,
+        locations=[f["id"] for f in context_shapes["features"]],
+        z=[0] * len(context_shapes["features"]),
+        colorscale=[[0, "#e9ecef"], [1, "#e9ecef"]],
+        showscale=False,
+        marker_line_color="white",
+        marker_line_width=0.5,
+        hoverinfo="skip"
+    ))
+    fig.add_trace(go.Choroplethmap(
+        geojson=shapes,
+        locations=shaped_df["ISO"],
+        z=shaped_df[map_metric],
+        coloraxis="coloraxis",
+        marker_line_color="white",
+        marker_line_width=0.5,
+        customdata=np.stack([shaped_df["Country"], shaped_df["Note"]], axis=-1) if len(shaped_df) else None,
+        hovertemplate=f"<b>%{{customdata[0]}}</b><br>{map_metric}: %{{z:{value_format}}}%{{customdata[1]}}<extra></extra>"
+    ))
+    fig.add_trace(go.Scattermap(
+        lat=[p[1] for p in points],
+        lon=[p[2] for p in points],
+        mode="markers",
+        marker=dict(size=10, color=point_df[map_metric], coloraxis="coloraxis"),
+        customdata=np.stack([point_df["Country"], point_df[map_metric], point_df["Note"]], axis=-1) if points else None,
+        hovertemplate=f"<b>%{{customdata[0]}}</b><br>{map_metric}: %{{customdata[1]:{value_format}}}%{{customdata[2]}}<extra></extra>"
+    ))
+    if len(no_data):
+        fig.add_trace(go.Choroplethmap(
+            geojson=no_data_shapes,
+            locations=[f["id"] for f in no_data_shapes["features"]],
+            z=[0] * len(no_data_shapes["features"]),
+            colorscale=[[0, "#adb5bd"], [1, "#adb5bd"]],
+            showscale=False,
+            marker_line_color="white",
+            marker_line_width=0.5,
+            customdata=[no_data.loc[f["id"], "Country"] for f in no_data_shapes["features"]],
+            hovertemplate=f"<b>%{{customdata}}</b><br>{map_metric}: no cost data<extra></extra>"
+        ))
+        fig.add_trace(go.Scattermap(
+            lat=[p[1] for p in no_data_points],
+            lon=[p[2] for p in no_data_points],
+            mode="markers",
+            marker=dict(size=10, color="#adb5bd"),
+            customdata=[no_data.loc[p[0], "Country"] for p in no_data_points],
+            hovertemplate=f"<b>%{{customdata}}</b><br>{map_metric}: no cost data<extra></extra>"
+        ))
+    # "white-bg" needs no tiles, fonts or Plotly CDN geometry, so the map renders offline
+    fig.update_layout(
+        title=f"{map_metric} by Country",
+        map=dict(style="white-bg", center=dict(lat=20, lon=10), zoom=0.4),
+        coloraxis=dict(colorscale=["#e8ecf7", "#6988C0", "#2f4696", "#232762"],
+                       colorbar=dict(title=None, thickness=12)),
+        showlegend=False,
+        margin=dict(t=50, b=10, l=10, r=10),
+        height=420,
+        paper_bgcolor='rgba(0,0,0,0)'
+    )
+    return fig
+
+
+@metrics.timed("charts.case_breakdown")
+def case_breakdown_figure(case_totals, value_col, title):
+    # Create custom hover text with line breaks
+    case_totals['hover_text'] = case_totals.apply(
+        lambda row: f"<b>Case Type:</b> {row['Case Type']}<br><br>" +
+                    f"{case_type_descriptions.get(row['Case Type'], '')}<br><br>" +
+                    f"<b>{value_col}:</b> {row[value_col]:.2f}",
+        axis=1
+    )
+
+    fig = px.pie(
+        case_totals,
+        values=value_col,
+        names="Case Type",
+        color="Case Type",
+        color_discrete_map=case_type_colors,
+        title=title
+    )
+    fig.update_traces(textinfo="label+percent", textposition="outside",
+                      marker=dict(line=dict(color='rgba(0,0,0,0)', width=0)),
+                      hovertemplate="%{customdata}<extra></extra>",
+                      customdata=case_totals['hover_text'],
+                      hoverlabel=dict(namelength=-1, # Ensure the full label is shown
+                                      font=dict(size=12)))
+    fig.update_layout(showlegend=False,
+                      margin=dict(t=50, b=50, l=50, r=50), uniformtext_minsize=12, uniformtext_mode='hide',
+                      plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
+    return fig
+
+
+@metrics.timed("charts.higher_risk")
+def higher_risk_figure(higher_risk_messages):
+    # Prepare a DataFrame for the horizontal bar chart
+    chart_data = pd.DataFrame(higher_risk_messages)
+    chart_data['risk_multiple'] = chart_data['risk_multiple'].round(1)
+
+    # Create base and excess risk columns for stacked bars
+    chart_data['risk_base'] = np.minimum(chart_data['risk_multiple'], 1.0)
+    chart_data['risk_excess'] = np.maximum(0, chart_data['risk_multiple'] - 1.0)
+
+    # Sort data for the chart
+    chart_data = chart_data.sort_values('risk_multiple', ascending=True)
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Bar(
+        x=chart_data['risk_base'],
+        y=chart_data['case_type'],
+        name='Global Average',
+        orientation='h',
+        marker_color='#2f4696',
+        hoverinfo='none'
+    ))
+
+    fig.add_trace(go.Bar(
+        x=chart_data['risk_excess'],
+        y=chart_data['case_type'],
+        name='Higher Risk',
+        orientation='h',
+        marker_color='#D4002C',
+        text=[f"{val:.1f}x higher" for val in chart_data['risk_multiple']],
+        textposition='outside',
+        textfont=dict(color='#D4002C', size=14, family='Arial, sans-serif')
+    ))
+
+    fig.update_layout(
+        barmode='stack',
+        title='Your Higher Risk Areas vs. Global Average',
+        title_x=0, # Left align title
+        font_color="black",
+        xaxis_title=None,
+        yaxis_title=None,
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        xaxis=dict(showgrid=False, range=[0, chart_data['risk_multiple'].max() * 1.1]),
+        yaxis=dict(showgrid=False, automargin=True),
+        showlegend=False,
+        width=None,
+        height=300,
+        font=dict(family='Arial, sans-serif')
+    )
+    return fig
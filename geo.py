@@ -0,0 +1,176 @@
+import json
+from pathlib import Path
+
+import streamlit as st
+
+import metrics
+
+# Natural Earth 1:110m admin-0 polygons (public domain), simplified and rounded by
+# `python geo.py <ne_110m_admin_0_countries.shp>`. Countries too small to have a polygon
+# at that scale (Singapore, Malta, most island states) only get a center point, which
+# the map draws as a marker instead. Rebuilding needs pyshp, shapely and countryinfo,
+# which the app itself does not.
+GEOMETRY_PATH = Path(__file__).parent / "country_geometry.json"
+
+SIMPLIFY_TOLERANCE = 0.1  # degrees
+COORD_DECIMALS = 2
+
+# Workbook country names that neither Natural Earth nor countryinfo spell the same way
+ISO_ALIASES = {
+    "Bonaire, Sint Eustatius and Saba": "BES",
+    "Congo": "COG",
+    "Congo, Democratic Republic": "COD",
+    "Cote d'Ivoire": "CIV",
+    "Curacao": "CUW",
+    "East Timor": "TLS",
+    "Hong Kong, SAR": "HKG",
+    "Korea, North": "PRK",
+    "Korea, South": "KOR",
+    "Kosovo": "XKX",
+    "Macao, SAR": "MAC",
+    "Micronesia, Federated States": "FSM",
+    "Saint Martin (French Part)": "MAF",
+    "Sint Maarten (Dutch Part)": "SXM",
+    "Taiwan, ROC": "TWN",
+    "US Virgin Islands": "VIR",
+}
+
+# Territories countryinfo has no center point for
+CENTER_OVERRIDES = {
+    "BES": [12.18, -68.25],
+    "CUW": [12.17, -68.99],
+    "MAF": [18.07, -63.05],
+    "SXM": [18.04, -63.07],
+    "TCA": [21.69, -71.8],
+    "VGB": [18.43, -64.62],
+    "VIR": [18.34, -64.9],
+}
+
+
+# -------------------------
+# Runtime Lookup
+# -------------------------
+@st.cache_resource
+def load_country_geometry():
+    # Held once per process and shared by every session; callers must not mutate it.
+    metrics.cache_miss("country_geometry")
+    with open(GEOMETRY_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def country_geometry():
+    with metrics.cache_lookup("country_geometry"):
+        return load_country_geometry()
+
+
+def country_isos(names):
+    iso_by_name = country_geometry()["iso_by_name"]
+    return [iso_by_name.get(name) for name in names]
+
+
+def country_shapes(iso_codes):
+    # Split the requested countries into a GeoJSON FeatureCollection of those with
+    # polygons and a list of (iso, lat, lon) points for the rest.
+    countries = country_geometry()["countries"]
+    features, points = [], []
+    for iso in iso_codes:
+        country = countries.get(iso)
+        if country is None:
+            continue
+        if country["geometry"] is not None:
+            features.append({"type": "Feature", "id": iso, "geometry": country["geometry"]})
+        elif country["center"] is not None:
+            points.append((iso, *country["center"]))
+    return {"type": "FeatureCollection", "features": features}, points
+
+
+def other_country_shapes(iso_codes):
+    # Every polygon not in iso_codes, drawn as the neutral backdrop behind the data
+    excluded = set(iso_codes)
+    countries = country_geometry()["countries"]
+    return {"type": "FeatureCollection", "features": [
+        {"type": "Feature", "id": iso, "geometry": country["geometry"]}
+        for iso, country in countries.items()
+        if iso not in excluded and country["geometry"] is not None
+    ]}
+
+
+# -------------------------
+# Build
+# -------------------------
+def _round_coords(coords):
+    if isinstance(coords[0], (int, float)):
+        return [round(c, COORD_DECIMALS) for c in coords]
+    return [_round_coords(c) for c in coords]
+
+
+def build_country_geometry(shapefile_path, workbook_path="Trip and cases report 2023-2025.xlsx"):
+    import importlib.resources
+
+    import pandas as pd
+    import shapefile
+    from shapely.geometry import mapping, shape
+
+    # countryinfo supplies ISO codes, alternative spellings and a center point for
+    # every country, including the ones Natural Earth drops at 1:110m.
+    names_to_iso, centers = {}, {}
+    for path in (importlib.resources.files("countryinfo") / "data").iterdir():
+        if path.suffix != ".json":
+            continue
+        info = json.loads(path.read_text(encoding="utf-8"))
+        iso = (info.get("ISO") or {}).get("alpha3")
+        if not iso:
+            continue
+        for name in [info.get("name"), *(info.get("altSpellings") or [])]:
+            if name:
+                names_to_iso.setdefault(name.lower(), iso)
+        if info.get("latlng"):
+            centers[iso] = [round(v, COORD_DECIMALS) for v in info["latlng"][:2]]
+    centers.update(CENTER_OVERRIDES)
+
+    countries = {}
+    reader = shapefile.Reader(str(shapefile_path))
+    for shape_record in reader.iterShapeRecords():
+        record = {k.lower(): v for k, v in shape_record.record.as_dict().items()}
+        name = record.get("name")
+        iso = record.get("iso_a3")
+        if iso in (None, "-99"):
+            iso = record.get("adm0_a3") or names_to_iso.get(name.lower()) or ISO_ALIASES.get(name)
+        if not iso or iso == "ATA":
+            continue
+        names_to_iso.setdefault(name.lower(), iso)
+
+        geometry = shape(shape_record.shape.__geo_interface__)
+        geometry = geometry.simplify(SIMPLIFY_TOLERANCE, preserve_topology=True)
+        geojson = mapping(geometry)
+        countries[iso] = {
+            "name": name,
+            "center": centers.get(iso) or [round(geometry.centroid.y, COORD_DECIMALS), round(geometry.centroid.x, COORD_DECIMALS)],
+            "geometry": {"type": geojson["type"], "coordinates": _round_coords(json.loads(json.dumps(geojson["coordinates"])))},
+        }
+
+    # Resolve every country the workbook can report on, so the app never guesses at runtime
+    iso_by_name, unresolved = {}, []
+    workbook_countries = pd.read_excel(workbook_path, sheet_name="Trips and Cases")["Country Name"].dropna()
+    for name in workbook_countries:
+        iso = ISO_ALIASES.get(name) or names_to_iso.get(name.lower())
+        if iso is None:
+            unresolved.append(name)
+            continue
+        iso_by_name[name] = iso
+        if iso not in countries:
+            countries[iso] = {"name": name, "center": centers.get(iso), "geometry": None}
+
+    if unresolved:
+        raise ValueError(f"No ISO code for workbook countries: {', '.join(unresolved)}. Add them to ISO_ALIASES.")
+
+    with open(GEOMETRY_PATH, "w", encoding="utf-8") as f:
+        json.dump({"iso_by_name": iso_by_name, "countries": countries}, f, separators=(",", ":"), sort_keys=True)
+    print(f"{len(countries)} countries ({sum(c['geometry'] is not None for c in countries.values())} with polygons), "
+          f"{GEOMETRY_PATH.stat().st_size:,} bytes -> {GEOMETRY_PATH}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    build_country_geometry(sys.argv[1])
@@ -0,0 +1,255 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import nullcontext
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Per-process timings and counters for the page, collected only when switched on:
+#
+#   APP_METRICS=1       collect, and serve Prometheus text on 127.0.0.1:APP_METRICS_PORT
+#                       (9464 by default) when started through server.py
+#   APP_METRICS_LOG=1   collect, and log one JSON line per rerun to the "app.metrics" logger
+#
+# When both are off, span() hands back a shared no-op context manager and timed()
+# returns the function unchanged, so the instrumented code pays next to nothing.
+
+def _flag(name):
+    return os.environ.get(name, "").strip().lower() not in ("", "0", "false", "no", "off")
+
+
+SERVE = _flag("APP_METRICS")
+LOG = _flag("APP_METRICS_LOG")
+ENABLED = SERVE or LOG
+PORT = int(os.environ.get("APP_METRICS_PORT", "9464"))
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 3, 5, 10, 25, 50, 100, 250, 1000, 10000, 100000)
+
+# name: (type, help, buckets)
+METRICS = {
+    "app_span_seconds": ("histogram", "Time spent in each page section and computational stage.", LATENCY_BUCKETS),
+    "app_portfolio_countries": ("histogram", "Countries entered per rerun that reaches the results.", SIZE_BUCKETS),
+    "app_portfolio_trips": ("histogram", "Total trips entered per rerun that reaches the results.",
+                            (10, 100, 1000, 10000, 100000, 1000000, 10000000)),
+    "app_cache_lookups_total": ("counter", "Cached loader calls by outcome (hit or miss).", None),
+    "app_reruns_total": ("counter", "Completed page reruns.", None),
+}
+
+logger = logging.getLogger("app.metrics")
+if LOG and not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+_local = threading.local()  # per script thread: current rerun's span totals and cache misses
+
+
+# -------------------------
+# Recording
+# -------------------------
+def count(name, value=1, **labels):
+    if not ENABLED:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    if not ENABLED:
+        return
+    buckets = METRICS[name][2]
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        series = _histograms.get(key)
+        if series is None:
+            series = _histograms[key] = [0] * len(buckets) + [0.0, 0]
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+
+def _record_span(name, seconds):
+    observe("app_span_seconds", seconds, span=name)
+    spans = getattr(_local, "spans", None)
+    if spans is not None:
+        total = spans.get(name, 0.0)
+        spans[name] = total + seconds
+
+
+class _Span:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _record_span(self.name, time.perf_counter() - self.started)
+        return False
+
+
+_NO_SPAN = nullcontext()
+
+
+def span(name):
+    return _Span(name) if ENABLED else _NO_SPAN
+
+
+def timed(name):
+    # Decorator form of span(); leaves the function untouched when metrics are off
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def clock():
+    # Start time for a section that is too long to indent under span(); pass it to section()
+    return time.perf_counter() if ENABLED else None
+
+
+def section(name, started):
+    if started is not None:
+        _record_span(name, time.perf_counter() - started)
+
+
+# -------------------------
+# Cache Lookups
+# -------------------------
+def cache_miss(cache):
+    # Call from inside a cached function's body, which only runs on a miss. Counted here,
+    # so misses outside cache_lookup() (the startup warm-up, for one) still show up.
+    if ENABLED:
+        count("app_cache_lookups_total", cache=cache, outcome="miss")
+        _local.cache_misses = getattr(_local, "cache_misses", set()) | {cache}
+
+
+class _CacheLookup(_Span):
+    __slots__ = ("cache",)
+
+    def __init__(self, cache):
+        super().__init__(f"cache.{cache}")
+        self.cache = cache
+
+    def __enter__(self):
+        _local.cache_misses = getattr(_local, "cache_misses", set()) - {self.cache}
+        return super().__enter__()
+
+    def __exit__(self, *exc):
+        if self.cache not in _local.cache_misses:
+            count("app_cache_lookups_total", cache=self.cache, outcome="hit")
+        return super().__exit__(*exc)
+
+
+def cache_lookup(cache):
+    # Times a call to a cached function (including deserializing a hit) and counts a hit;
+    # the cached function counts its own misses with cache_miss()
+    return _CacheLookup(cache) if ENABLED else _NO_SPAN
+
+
+# -------------------------
+# Reruns
+# -------------------------
+def begin_rerun():
+    if not ENABLED:
+        return None
+    _local.spans = {}
+    return time.perf_counter()
+
+
+def end_rerun(started, countries=0, trips=0):
+    if started is None:
+        return
+    seconds = time.perf_counter() - started
+    _record_span("page.rerun", seconds)
+    count("app_reruns_total")
+    if countries:
+        observe("app_portfolio_countries", countries)
+        observe("app_portfolio_trips", trips)
+    if LOG:
+        logger.info(json.dumps({
+            "event": "rerun",
+            "ms": round(seconds * 1000, 3),
+            "countries": countries,
+            "trips": int(trips),
+            "spans_ms": {name: round(s * 1000, 3) for name, s in (getattr(_local, "spans", None) or {}).items()},
+        }))
+    _local.spans = None
+
+
+# -------------------------
+# Prometheus Exposition
+# -------------------------
+def _format_labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def render_prometheus():
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(series) for key, series in _histograms.items()}
+
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        if kind == "counter":
+            for (series_name, labels), value in sorted(counters.items()):
+                if series_name == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+            continue
+        for (series_name, labels), series in sorted(histograms.items()):
+            if series_name != name:
+                continue
+            for bound, bucket_count in zip(buckets, series):
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', repr(float(bound)))])} {bucket_count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {series[-1]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {series[-2]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {series[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=PORT, host="127.0.0.1"):
+    # Bound to loopback only: the metrics are for a local scraper, not the public port
+    httpd = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=httpd.serve_forever, name="metrics-http", daemon=True).start()
+    return httpd
@@ -0,0 +1,64 @@
+import threading
+import time
+
+import streamlit as st
+from streamlit.logger import get_logger
+
+import metrics
+import simulation
+from charts import (case_breakdown_figure, country_bar_figure, country_map_figure,
+                    higher_risk_figure, map_metric_formats)
+from geo import country_geometry
+
+# The workbooks and the tables derived from them, loaded once per process. server.py
+# runs warm_up() in the background at startup and holds the health check at 503 until
+# `ready` is set, so the first visitor to a new process finds everything already built.
+
+logger = get_logger(__name__)
+
+ready = threading.Event()
+
+WARM_UP_TRIPS = 100
+
+
+@st.cache_resource
+def load_reference_data():
+    # Held once per process and shared by every session; callers must not mutate it.
+    metrics.cache_miss("reference_data")
+    return simulation.reference_tables(*simulation.load_data())
+
+
+def warm_up():
+    # Everything a first rerun would otherwise pay for: the workbook reads, the derived
+    # tables, the country geometry and the first build of each figure (Plotly imports
+    # and validates lazily), using the first few countries in the workbook.
+    started = time.perf_counter()
+    try:
+        with metrics.cache_lookup("reference_data"):
+            reference = load_reference_data()
+        country_geometry()
+
+        countries = list(reference["data"]["Country"].unique()[:3])
+        results_df = simulation.estimate_cases(reference["country_rates"], countries, [WARM_UP_TRIPS] * len(countries))
+        total_trips = results_df["Trips"].sum()
+        all_higher_risks = simulation.higher_risks(reference["global_rates"], results_df, total_trips)
+        map_df = simulation.country_map_metrics(reference["global_rates"], reference["case_costs"], results_df)
+
+        figures = [
+            country_bar_figure(results_df),
+            case_breakdown_figure(simulation.user_case_totals(results_df), "Estimated Cases", "Your Estimated Case Breakdown"),
+            case_breakdown_figure(simulation.global_benchmark(reference["global_rates"], total_trips),
+                                  "Benchmark Cases", "Global Average Case Breakdown"),
+            country_map_figure(map_df, next(iter(map_metric_formats))),
+        ]
+        top_risks = simulation.top_higher_risks(all_higher_risks)
+        if top_risks:
+            figures.append(higher_risk_figure(top_risks))
+        for fig in figures:
+            fig.to_json()
+    except Exception:
+        logger.exception("Warm-up failed; the health check will keep reporting not ready")
+        return
+
+    ready.set()
+    logger.info("Warm-up finished in %.2fs", time.perf_counter() - started)
@@ -0,0 +1,75 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import streamlit as st
+from starlette.middleware import Middleware
+
+import metrics
+import reference
+
+STATIC_PREFIX = "/app/static/"
+STATIC_CACHE_CONTROL = b"public, max-age=31536000, immutable"
+HEALTH_PATH = "/_stcore/health"
+
+
+class StaticCacheMiddleware:
+    # Streamlit's static route only sends ETag/Last-Modified. URLs built by
+    # assets.static_url() carry a content hash, so they can be cached for a year.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or STATIC_PREFIX not in scope["path"]
+                or b"v=" not in scope.get("query_string", b"")):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cache_headers(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = [(k, v) for k, v in message.get("headers", []) if k.lower() != b"cache-control"]
+                headers.append((b"cache-control", STATIC_CACHE_CONTROL))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_cache_headers)
+
+
+class ReadinessMiddleware:
+    # Streamlit reports healthy as soon as it can accept a session. Until the startup
+    # warm-up has finished, answer 503 instead, so readiness probes and load balancers
+    # only send visitors to a warm process.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].endswith(HEALTH_PATH) or reference.ready.is_set():
+            await self.app(scope, receive, send)
+            return
+
+        await send({"type": "http.response.start", "status": 503,
+                    "headers": [(b"content-type", b"text/plain; charset=utf-8"), (b"cache-control", b"no-cache")]})
+        await send({"type": "http.response.body", "body": b"warming up"})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # With APP_METRICS=1, Prometheus text is served on 127.0.0.1:APP_METRICS_PORT/metrics
+    metrics_server = metrics.serve() if metrics.SERVE else None
+    # Off the event loop, so the server keeps answering (with 503s) while it runs
+    warm_up = asyncio.create_task(asyncio.to_thread(reference.warm_up))
+    try:
+        yield
+    finally:
+        warm_up.cancel()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+
+
+# Production entry point: `streamlit run server.py` (or `python server.py`).
+# `streamlit run app.py` still works, just without the long-lived cache headers,
+# the metrics endpoint or the startup warm-up.
+app = st.App("app.py", lifespan=lifespan,
+             middleware=[Middleware(ReadinessMiddleware), Middleware(StaticCacheMiddleware)])
+
+if __name__ == "__main__":
+    app.run()
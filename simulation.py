@@ -0,0 +1,339 @@
+import logging
+from typing import NamedTuple
+
+import pandas as pd
+
+import metrics
+
+# The computational stages behind each section of the report. Nothing here touches
+# Streamlit, so the page, the benchmarks and any warm-up code can all call them directly.
+
+logger = logging.getLogger(__name__)
+
+TRIPS_WORKBOOK = "Trip and cases report 2023-2025.xlsx"
+COST_WORKBOOK = "Cases_Cost_Combined_Average by Type.xlsx"
+
+# -------------------------
+# Case Types
+# -------------------------
+class CaseType(NamedTuple):
+    id: str
+    name: str  # as shown in the report, and as the workbook columns are named
+    color: str
+    description: str
+    cost_as: str | None = None  # id of the case type whose average cost column this one uses
+    in_cost_breakdown: bool = True
+
+
+# In report order. The trips workbook has a "<name> Case Probability" column for every
+# case type and the cost workbook an "<name> Average Case Cost" column for every one
+# without cost_as; load_data() checks both against this table.
+CASE_TYPES = (
+    CaseType("medical_information", "Medical Information & Analysis", "#2f4696",
+             "i.e. Emergency and routine medical advice, First aid advice, Travel health & inoculation advice, Inflight medical advice etc.",
+             in_cost_breakdown=False),
+    CaseType("medical_out_patient", "Medical Out-Patient", "#6988C0",
+             "When the patient receives medical services for the purpose of diagnosis or treatment and is not admitted as an inpatient by the treating physician."),
+    CaseType("medical_in_patient", "Medical In-Patient", "#FFD744",
+             "i.e. Arrangement of Admission, Identifying Treating Doctor for Hospitalization, Medical contacts by the Medical Team with the treating doctors during or after patient's hospitalization"),
+    CaseType("medical_evacuation_repatriation", "Medical Evacs, Repats, & RMR", "#DD2484",
+             "Arrangement for air and/or surface transportation, medical care during transportation and communications for a patient as well as the transportation of the patient’s mortal remains"),
+    CaseType("security_evacuation_repatriation", "Security Evacs, Repats, & RMR", "#6C206B",
+             "Arrangement for air and/or surface transportation and communications for a patient as well as transportation of the patient’s mortal remains"),
+    CaseType("security_information", "Security Information & Analysis", "#009354",
+             "i.e. Risk assessments, Travel security advice, Country-specific threat levels, Pre-travel briefings, Intelligence on protests, crime, terrorism, political instability, or other emerging threats",
+             in_cost_breakdown=False),
+    CaseType("security_referral", "Security Referral", "#EF820F",
+             "i.e. Connection to vetted security providers, Secure ground transportation, Vetted accommodation, Security escorts, Local security consultancy, Risk mitigation services through third-party partners",
+             in_cost_breakdown=False),
+    CaseType("security_intervention", "Security Interventional Assistance", "#D4002C",
+             "i.e. On-the-ground security guidance during an incident, Advice on shelter-in-place vs. evacuation, Emergency relocation coordination, Active threat monitoring, Coordination with local response services, Immediate support during unrest, crime, or crisis"),
+    # The cost workbook has no column of its own for this one
+    CaseType("security_evacuation", "Security Evacuation", "#EEEFEF",
+             "i.e. Extraction from high-risk environments, Evacuation due to conflict, terrorism, or natural disaster with security implications, Charter flight coordination, Secure ground movement out of danger zones, Coordination with embassies or insurers for evacuation)",
+             cost_as="security_evacuation_repatriation"),
+    CaseType("travel_information", "Travel Information & Analysis", "#232762",
+             "Any service rendered relating to travel including pre-trip.",
+             in_cost_breakdown=False),
+)
+
+PROBABILITY_SUFFIX = " Case Probability"
+COST_SUFFIX = " Average Case Cost"
+
+case_type_names = [case_type.name for case_type in CASE_TYPES]
+case_type_colors = {case_type.name: case_type.color for case_type in CASE_TYPES}
+case_type_descriptions = {case_type.name: case_type.description for case_type in CASE_TYPES}
+cost_breakdown_types = [case_type.name for case_type in CASE_TYPES if case_type.in_cost_breakdown]
+
+# -------------------------
+# Region Mapping
+# -------------------------
+region_mapping = {
+    "Afghanistan": "South Asia", "Azerbaijan": "Europe & Central Asia", "Bangladesh": "South Asia",
+    "Benin": "Sub-Saharan Africa", "Brazil": "Latin America & Caribbean", "China": "East Asia & Pacific",
+    "Egypt": "Middle East & North Africa", "France": "Europe & Central Asia",
+    "India": "South Asia", "Japan": "East Asia & Pacific", "Kenya": "Sub-Saharan Africa",
+    "Mexico": "Latin America & Caribbean", "Nigeria": "Sub-Saharan Africa",
+    "Pakistan": "South Asia", "South Africa": "Sub-Saharan Africa", "United States": "North America",
+    "United Kingdom": "Europe & Central Asia"
+}
+
+
+# -------------------------
+# Load Data
+# -------------------------
+def check_sheet(df, path, country_col, value_cols, suffix, allow_empty_values, count_cols=(), max_value=None):
+    # Collects every problem with a sheet before failing, so a bad workbook is fixed in one go.
+    # value_cols are the case type columns; count_cols are other numeric columns that must be
+    # filled in. Case type values above max_value are logged rather than rejected: the bundled
+    # trips workbook has a few countries with more than one case per trip.
+    problems, warnings = [], []
+    missing = [col for col in [country_col, *count_cols, *value_cols] if col not in df.columns]
+    if missing:
+        problems.append(f"missing columns {missing}")
+    unknown = [col for col in df.columns if str(col).endswith(suffix) and col not in value_cols]
+    if unknown:
+        problems.append(f"columns for case types not in CASE_TYPES {unknown}")
+
+    # Flagged rows are named by country, or by spreadsheet row if that column is missing
+    countries = df[country_col] if country_col in df.columns else pd.Series(df.index + 2, index=df.index)
+    if country_col in df.columns:
+        if countries.isna().any():
+            problems.append(f"{countries.isna().sum()} rows without a country")
+        duplicated = sorted(countries[countries.duplicated()].dropna().unique())
+        if duplicated:
+            problems.append(f"countries listed more than once {duplicated}")
+
+    def rows(mask, limit=5):
+        flagged = [str(country) for country in countries[mask]]
+        return ", ".join(flagged[:limit]) + (f" and {len(flagged) - limit} more" if len(flagged) > limit else "")
+
+    for col in [*count_cols, *value_cols]:
+        if col not in df.columns:
+            continue
+        values = df[col]
+        numbers = pd.to_numeric(values, errors="coerce")
+        non_numeric = values.notna() & numbers.isna()
+        if non_numeric.any():
+            problems.append(f"non-numeric values in {col!r} ({rows(non_numeric)})")
+        if (numbers < 0).any():
+            problems.append(f"negative values in {col!r} ({rows(numbers < 0)})")
+        if values.isna().any() and (col in count_cols or not allow_empty_values):
+            problems.append(f"empty cells in {col!r} ({rows(values.isna())})")
+        if max_value is not None and col in value_cols and (numbers > max_value).any():
+            warnings.append(f"values above {max_value} in {col!r} ({rows(numbers > max_value)})")
+
+    if problems:
+        raise ValueError(f"{path}: " + "; ".join(problems + warnings))
+    if warnings:
+        logger.warning("%s: %s", path, "; ".join(warnings))
+
+
+@metrics.timed("simulation.load_data")
+def load_data(trips_path=TRIPS_WORKBOOK, cost_path=COST_WORKBOOK):
+    # Reads both workbooks, checks them against CASE_TYPES and names every case type
+    # column after its case type, so nothing downstream has to parse column names.
+    # Returns the trips data and each country's average cost per case type.
+    probability_columns = {f"{case_type.name}{PROBABILITY_SUFFIX}": case_type.name for case_type in CASE_TYPES}
+    df = pd.read_excel(trips_path, sheet_name="Trips and Cases")
+    check_sheet(df, trips_path, "Country Name", list(probability_columns), PROBABILITY_SUFFIX, allow_empty_values=False,
+                count_cols=["International Trips"], max_value=1)
+    df = df.rename(columns={"Country Name": "Country", "International Trips": "Trips", **probability_columns})
+
+    names_by_id = {case_type.id: case_type.name for case_type in CASE_TYPES}
+    cost_columns = {case_type.name: f"{names_by_id[case_type.cost_as or case_type.id]}{COST_SUFFIX}"
+                    for case_type in CASE_TYPES}
+    cost_df = pd.read_excel(cost_path, sheet_name="Sheet1")
+    check_sheet(cost_df, cost_path, "CountryName", list(dict.fromkeys(cost_columns.values())), COST_SUFFIX,
+                allow_empty_values=True)
+    case_costs = pd.DataFrame({name: cost_df[cost_col].to_numpy() for name, cost_col in cost_columns.items()},
+                              index=pd.Index(cost_df["CountryName"], name="Country"))
+
+    return df, case_costs
+
+
+@metrics.timed("simulation.reference_tables")
+def reference_tables(data, case_costs, regions=region_mapping):
+    # Everything that depends only on the workbooks: built once per process and shared
+    # by every session, so callers must not mutate it.
+    data = data.assign(Region=data["Country"].map(regions))
+    return {
+        "data": data,
+        # Case probabilities by exact country name; load_data() checks the names are unique
+        "country_rates": data.set_index("Country")[case_type_names],
+        "global_rates": data[case_type_names].mean(),
+        "regional_rates": {region: data[data["Region"] == region][case_type_names].mean()
+                           for region in sorted(data["Region"].dropna().unique())},
+        "case_costs": case_costs,
+    }
+
+
+# -------------------------
+# Results
+# -------------------------
+@metrics.timed("simulation.estimate_cases")
+def estimate_cases(country_rates, countries, trip_counts):
+    # Countries are looked up by exact name (the page only offers workbook names); one
+    # not in the workbook gets NaN for every case type and 0 total cases.
+    with metrics.span("simulation.country_lookup"):
+        rates = country_rates.reindex(countries)
+    results = rates.mul(trip_counts, axis=0)
+    total_cases = 0
+    for case_type in case_type_names:
+        total_cases = total_cases + results[case_type]
+    results = results.reset_index(drop=True)
+    results["Country"] = list(countries)
+    results["Trips"] = list(trip_counts)
+    results["Total Cases"] = total_cases.fillna(0).to_numpy()
+    return results
+
+
+def case_totals_frame(totals, value_col):
+    # Per-case-type totals (already in report order) as the two-column frame the pie
+    # charts take, leaving out case types without a value
+    case_totals = totals.rename_axis("Case Type").reset_index(name=value_col)
+    return case_totals.dropna(subset=[value_col])
+
+
+# -------------------------
+# Case Type Breakdown
+# -------------------------
+@metrics.timed("simulation.global_benchmark")
+def global_benchmark(global_rates, total_trips):
+    return case_totals_frame(global_rates * total_trips, "Benchmark Cases")
+
+
+@metrics.timed("simulation.regional_benchmark")
+def regional_benchmark(regional_rates, total_trips, region):
+    return case_totals_frame(regional_rates[region] * total_trips, "Benchmark Cases")
+
+
+@metrics.timed("simulation.user_case_totals")
+def user_case_totals(results_df, filter_country="All"):
+    case_results = results_df.drop(columns=["Country", "Trips", "Total Cases"])
+    if filter_country != "All":
+        case_results = case_results[results_df["Country"] == filter_country]
+    # min_count keeps a country with no data as NaN, so it drops out rather than showing zeros
+    return case_totals_frame(case_results.sum(min_count=1), "Estimated Cases")
+
+
+# -------------------------
+# Recommendations
+# -------------------------
+@metrics.timed("simulation.higher_risks")
+def higher_risks(global_rates, results_df, total_trips):
+    # Every case type whose share of the user's cases is above its share of the global
+    # average, in case type order, with how many times higher it is.
+    global_benchmark_cases_df = (global_rates * total_trips).to_frame(name="Benchmark Cases")
+
+    user_case_totals_df = results_df.drop(columns=["Country", "Trips", "Total Cases"]).sum().to_frame(name="Estimated Cases")
+
+    user_total_cases = 0
+    global_total_cases = 0
+
+    # Calculate user_total_cases and global_total_cases only if results_df is not empty
+    if not results_df.empty and results_df["Total Cases"].sum() > 0:
+        user_total_cases = user_case_totals_df['Estimated Cases'].sum()
+        global_total_cases = global_benchmark_cases_df['Benchmark Cases'].sum()
+
+    all_higher_risks = []
+    if user_total_cases > 0 and global_total_cases > 0:
+        for case_type in user_case_totals_df.index:
+            user_percentage = user_case_totals_df.loc[case_type, 'Estimated Cases'] / user_total_cases
+
+            if case_type in global_benchmark_cases_df.index:
+                global_percentage = global_benchmark_cases_df.loc[case_type, 'Benchmark Cases'] / global_total_cases
+
+                if user_percentage > global_percentage:
+                    risk_multiple = user_percentage / global_percentage
+                    all_higher_risks.append({'case_type': case_type, 'risk_multiple': risk_multiple})
+
+    return all_higher_risks
+
+
+def top_higher_risks(all_higher_risks, limit=3):
+    return sorted(all_higher_risks, key=lambda x: x['risk_multiple'], reverse=True)[:limit]
+
+
+# -------------------------
+# Estimated Cost Breakdown
+# -------------------------
+@metrics.timed("simulation.cost_risk_areas")
+def cost_risk_areas(case_costs, countries, all_higher_risks):
+    displayed_cost_risks = []
+
+    # 1. Prioritize top 3 higher risks that are not excluded
+    for risk in (r['case_type'] for r in all_higher_risks):
+        if risk in cost_breakdown_types and len(displayed_cost_risks) < 3:
+            displayed_cost_risks.append(risk)
+
+    # 2. If there are fewer than 3, fill the remaining slots with the highest cost items
+    if len(displayed_cost_risks) < 3:
+        all_potential_cost_items = []
+
+        # Find the highest average cost for each non-excluded case type among selected countries
+        for case_type_display in cost_breakdown_types:
+            if case_type_display not in displayed_cost_risks:
+                country_costs_for_type = case_costs.loc[case_costs.index.isin(countries), case_type_display].dropna()
+
+                if not country_costs_for_type.empty:
+                    max_cost = country_costs_for_type.max()
+                    all_potential_cost_items.append({'case_type': case_type_display, 'cost': max_cost})
+
+        # Sort by cost descending
+        all_potential_cost_items.sort(key=lambda x: x['cost'], reverse=True)
+
+        # Add to the display list, avoiding duplicates
+        for item in all_potential_cost_items:
+            if len(displayed_cost_risks) < 3:
+                displayed_cost_risks.append(item['case_type'])
+
+    return displayed_cost_risks
+
+
+@metrics.timed("simulation.max_case_cost")
+def max_case_cost(case_costs, countries, case_type):
+    # The selected country with the highest average cost for this case type, or None
+    country_costs_for_type = case_costs.loc[case_costs.index.isin(countries), case_type].dropna()
+    if country_costs_for_type.empty:
+        return None
+
+    return country_costs_for_type.idxmax(), country_costs_for_type.max()
+
+
+# -------------------------
+# Country Map
+# -------------------------
+@metrics.timed("simulation.country_map_metrics")
+def country_map_metrics(global_rates, case_costs, results_df):
+    # One row per country, even if it was entered more than once
+    totals = results_df.groupby("Country", sort=False).sum(min_count=1)
+
+    # Expected cost: estimated cases of each type x that country's average case cost.
+    # Case types with cases but no average cost for the country are left out of the sum
+    # and listed under "Missing Cost Data"; with no cost for any of them it is NaN, not $0.
+    expected_costs, missing_costs = [], []
+    for country, row in totals.iterrows():
+        costs = case_costs.loc[country] if country in case_costs.index else None
+        expected_cost, covered, missing = 0.0, False, []
+        for case_type in case_costs.columns:
+            cases = row.get(case_type)
+            if pd.isna(cases) or cases == 0:
+                continue
+            if costs is None or pd.isna(costs[case_type]):
+                missing.append(case_type)
+            else:
+                expected_cost += cases * costs[case_type]
+                covered = True
+        expected_costs.append(expected_cost if covered or not missing else float("nan"))
+        missing_costs.append(", ".join(missing))
+
+    map_df = totals[["Trips", "Total Cases"]].reset_index()
+    map_df["Expected Cost"] = expected_costs
+    map_df["Missing Cost Data"] = missing_costs
+    map_df["Estimated Cases"] = map_df["Total Cases"]
+    # The country's estimated cases per trip over the unweighted mean across all workbook
+    # countries. Not the share-based multiple of the Higher Risk Alert (higher_risks()).
+    global_cases_per_trip = global_rates.sum()
+    map_df["Cases per Trip vs. Global Mean"] = (map_df["Total Cases"] / map_df["Trips"]) / global_cases_per_trip
+    return map_df